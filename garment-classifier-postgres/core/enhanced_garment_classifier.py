@@ -5,86 +5,413 @@ Improved classification with confidence thresholding and better prompts
 """
 
 import os
+import io
+import copy
 import json
 import torch
+from torch.utils.data import Dataset, DataLoader
+from torchvision.io import read_file, decode_jpeg, ImageReadMode
+from torchvision.transforms import InterpolationMode
+try:
+    from torchvision.transforms import v2 as transforms
+except ImportError:
+    from torchvision import transforms
 import clip
 from PIL import Image
 import numpy as np
 from pathlib import Path
 import logging
+import threading
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Reference features are cached next to the reference images
+REFERENCE_CACHE_FILE = ".clip_vitb32_cache.pt"
+
+# Exported visual encoder for ONNX Runtime, stored next to the reference images
+ONNX_MODEL_FILE = "vitb32_visual.onnx"
+
+# Number of reference images encoded per forward pass
+REFERENCE_BATCH_SIZE = 32
+
+# CLIP ViT-B/32 input size and normalization, used for GPU preprocessing
+CLIP_INPUT_SIZE = 224
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+# JPEGs are decoded at the smallest DCT scale that keeps both sides at least
+# this large, which is still above CLIP's 224px input
+DRAFT_SIZE = 256
+
+def _open_image(fp):
+    """Open an image as RGB, letting libjpeg downscale large JPEGs during decode"""
+    image = Image.open(fp)
+    # draft() is a no-op for formats other than JPEG
+    image.draft('RGB', (DRAFT_SIZE, DRAFT_SIZE))
+    return image.convert('RGB')
+
+def _is_jpeg(data):
+    """Check the SOI marker of encoded image bytes held in a uint8 tensor"""
+    return data[:2].tolist() == [0xFF, 0xD8]
+
+if NUMBA_AVAILABLE:
+    # fastmath=True would include 'ninf', letting LLVM assume no infinities, but the
+    # running maxima start at -inf (which empty categories also keep)
+    @njit(parallel=True, fastmath={'nnan', 'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, cache=True)
+    def _max_similarity_per_category(image_features, ref_features, ref_offsets):
+        """
+        CPU kernel for the max dot product between each image and each category
+        
+        Reference rows are grouped by category, with category c occupying rows
+        ref_offsets[c]:ref_offsets[c + 1], so categories are processed in parallel
+        without write conflicts.
+        """
+        num_categories = ref_offsets.shape[0] - 1
+        out = np.full((image_features.shape[0], num_categories), -np.inf, dtype=np.float32)
+        for c in prange(num_categories):
+            for b in range(image_features.shape[0]):
+                best = -np.inf
+                for i in range(ref_offsets[c], ref_offsets[c + 1]):
+                    s = 0.0
+                    for d in range(ref_features.shape[1]):
+                        s += image_features[b, d] * ref_features[i, d]
+                    if s > best:
+                        best = s
+                out[b, c] = best
+        return out
+
+class _PathDataset(Dataset):
+    """
+    Dataset of image paths yielding (index, payload, error, is_jpeg)
+    
+    The payload is the preprocessed image, or with raw_jpeg=True the encoded
+    bytes of JPEG files so they can be decoded on the GPU.
+    """
+    
+    def __init__(self, image_paths, preprocess, raw_jpeg=False):
+        self.image_paths = image_paths
+        self.preprocess = preprocess
+        self.raw_jpeg = raw_jpeg
+    
+    def __len__(self):
+        return len(self.image_paths)
+    
+    def __getitem__(self, idx):
+        try:
+            if self.raw_jpeg:
+                data = read_file(self.image_paths[idx])
+                if _is_jpeg(data):
+                    return idx, data, None, True
+            image = _open_image(self.image_paths[idx])
+            return idx, self.preprocess(image), None, False
+        except Exception as e:
+            return idx, None, str(e), False
+
+def _collate_images(samples):
+    """Stack preprocessed images, keep raw JPEG bytes apart and collect errors"""
+    indices, images, jpeg_indices, jpegs, errors = [], [], [], [], {}
+    for idx, payload, error, is_jpeg in samples:
+        if payload is None:
+            errors[idx] = error
+        elif is_jpeg:
+            jpeg_indices.append(idx)
+            jpegs.append(payload)
+        else:
+            indices.append(idx)
+            images.append(payload)
+    return indices, torch.stack(images) if images else None, jpeg_indices, jpegs, errors
+
 class EnhancedGarmentClassifier:
-    def __init__(self, reference_dir="reference_images_pinterest", confidence_threshold=0.15):
+    """
+    CLIP garment classifier backed by a bank of reference images
+    
+    Batched byte classification fills input buffers shared by the instance;
+    a lock serializes their use, so concurrent calls from several threads
+    are safe but do not run their forward passes in parallel.
+    """
+    
+    def __init__(self, reference_dir="reference_images_pinterest", confidence_threshold=0.15,
+                 use_cache=True, compile_model=True, embedding_cache_size=10_000,
+                 gpu_preprocess=True, use_onnx=False, cudnn_benchmark=False):
         """
         Initialize the enhanced garment classifier
         
         Args:
             reference_dir: Directory containing reference images
             confidence_threshold: Minimum confidence to classify as garment (vs Others)
+            use_cache: Reuse reference image features cached on disk from previous runs
+            compile_model: Compile the visual encoder with torch.compile (CUDA, torch>=2.0)
+            embedding_cache_size: Number of query image embeddings kept in memory by classify_image
+            gpu_preprocess: Decode and preprocess JPEGs on the GPU when running on CUDA
+            use_onnx: Run the visual encoder with ONNX Runtime (requires onnxruntime);
+                None uses it on CPU-only hosts when onnxruntime is installed
+            cudnn_benchmark: Let cuDNN autotune convolutions for the fixed 224x224 input (CUDA).
+                This sets torch.backends.cudnn.benchmark for the whole process
         """
         self.reference_dir = reference_dir
         self.confidence_threshold = confidence_threshold
+        self.use_cache = use_cache
+        self.model_name = "ViT-B/32"
+        self.compiled = False
+        self._eager_visual = None
+        self.ort_session = None
+        self._input_buf = None
+        self._pinned_buf = None
+        self._copy_stream = None
+        self._buffer_lock = threading.Lock()
+        
+        # Per-instance LRU of query embeddings keyed by (path, mtime, size)
+        self._embed_path = lru_cache(maxsize=embedding_cache_size)(self._encode_path)
         
         # Load CLIP model
         logger.info("Loading CLIP model...")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+        self.model, self.preprocess = clip.load(self.model_name, device=self.device)
+        # Inference only: no dropout, and no gradient bookkeeping on the weights
+        self.model.eval().requires_grad_(False)
+        if self.device == "cuda":
+            if cudnn_benchmark:
+                # Inputs are always 224x224, so the autotuned conv choice is reused every batch
+                torch.backends.cudnn.benchmark = True
+            # FP16 halves activation memory and runs the matmuls on tensor cores;
+            # inputs are cast to self.model.dtype before encode_image
+            self.model = self.model.half()
+            # NHWC lets cuDNN pick faster kernels for the patch embedding conv;
+            # _encode_image converts inputs to match
+            self.model = self.model.to(memory_format=torch.channels_last)
+        
+        if use_onnx is None:
+            use_onnx = self.device == "cpu" and ONNXRUNTIME_AVAILABLE
+        if use_onnx:
+            self._maybe_export_onnx()
         
-        # Load reference images and create prompts
-        self.categories, self.reference_features = self._load_reference_images()
+        # GPU equivalent of CLIP's PIL preprocess for JPEGs decoded on the device;
+        # other formats and JPEGs the GPU decoder rejects still go through PIL
+        self.gpu_preprocess = gpu_preprocess and self.device == "cuda"
+        if self.gpu_preprocess:
+            self._gpu_transform = torch.nn.Sequential(
+                transforms.ConvertImageDtype(torch.float32),
+                transforms.Resize(CLIP_INPUT_SIZE, interpolation=InterpolationMode.BICUBIC, antialias=True),
+                transforms.CenterCrop(CLIP_INPUT_SIZE),
+            )
+            self._gpu_normalize = transforms.Normalize(CLIP_MEAN, CLIP_STD)
+        
+        # Load reference images, reusing cached features
+        cache = self._load_reference_cache()
+        fresh_cache = {}
+        self.categories = self._load_reference_images(cache, fresh_cache)
+        self._save_reference_cache(cache, fresh_cache)
+        
+        # Compile after the reference images are encoded so their variable
+        # per-category batch sizes don't trigger recompilation
+        if (compile_model and self.ort_session is None and self.device == "cuda"
+                and hasattr(torch, "compile")):
+            logger.info("Compiling CLIP visual encoder...")
+            # torch.compile is lazy, so failures only show on the first forward pass;
+            # _encode_image then falls back to this eager module
+            self._eager_visual = self.model.visual
+            self.model.visual = torch.compile(self.model.visual, mode="reduce-overhead")
+            self.compiled = True
         
         logger.info(f"Loaded {len(self.categories)} categories with reference images")
     
-    def _load_reference_images(self):
-        """Load reference images and extract features"""
+    def _load_reference_images(self, cache=None, fresh_cache=None):
+        """
+        Load reference images and build the reference feature bank
+        
+        Args:
+            cache: Cached features keyed by (category, filename, mtime)
+            fresh_cache: Dict that receives the features of every image in use
+            
+        Returns:
+            List of category names, indexed by self.ref_category_ids
+        """
+        cache = {} if cache is None else cache
+        fresh_cache = {} if fresh_cache is None else fresh_cache
         categories = []
         reference_features = []
         
         if not os.path.exists(self.reference_dir):
             logger.error(f"Reference directory {self.reference_dir} not found!")
-            return categories, reference_features
+            self._build_reference_bank(reference_features)
+            return categories
         
-        for category_folder in os.listdir(self.reference_dir):
-            category_path = os.path.join(self.reference_dir, category_folder)
-            if not os.path.isdir(category_path):
-                continue
+        # scandir entries carry the file type, avoiding a stat call per entry
+        with os.scandir(self.reference_dir) as it:
+            category_entries = sorted((entry for entry in it if entry.is_dir()), key=lambda e: e.name)
+        
+        for category_entry in category_entries:
+            category_folder = category_entry.name
+            with os.scandir(category_entry.path) as it:
+                image_entries = sorted(
+                    (entry for entry in it
+                     if entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg', '.png'))),
+                    key=lambda e: e.name
+                )
             
-            # Load images for this category
+            # Load images for this category, skipping those already in the cache
+            cached_features = []
             category_images = []
-            for file in os.listdir(category_path):
-                if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    try:
-                        image_path = os.path.join(category_path, file)
-                        image = Image.open(image_path).convert('RGB')
-                        image = self.preprocess(image).unsqueeze(0).to(self.device)
-                        category_images.append(image)
-                    except Exception as e:
-                        logger.warning(f"Failed to load {file}: {e}")
+            new_keys = []
+            for entry in image_entries:
+                try:
+                    key = (category_folder, entry.name, entry.stat().st_mtime)
+                    if key in cache:
+                        cached_features.append(cache[key])
+                        fresh_cache[key] = cache[key]
                         continue
+                    
+                    image = _open_image(entry.path)
+                    category_images.append(self.preprocess(image))
+                    new_keys.append(key)
+                except Exception as e:
+                    logger.warning(f"Failed to load {entry.name}: {e}")
+                    continue
             
-            if category_images:
+            if category_images or cached_features:
                 # Stack images and extract features
                 try:
-                    images_tensor = torch.cat(category_images, dim=0)
-                    with torch.no_grad():
-                        features = self.model.encode_image(images_tensor)
-                        features = features / features.norm(dim=-1, keepdim=True)
+                    parts = []
+                    if cached_features:
+                        parts.append(torch.stack(cached_features).to(self.device, dtype=self.model.dtype))
+                    
+                    # Encode in fixed-size chunks so large categories don't spike memory
+                    for start in range(0, len(category_images), REFERENCE_BATCH_SIZE):
+                        chunk = category_images[start:start + REFERENCE_BATCH_SIZE]
+                        images_tensor = torch.stack(chunk).to(self.device, dtype=self.model.dtype)
+                        with torch.inference_mode():
+                            features = self._encode_image(images_tensor)
+                            features = features / features.norm(dim=-1, keepdim=True)
+                        parts.append(features)
+                        fresh_cache.update(zip(new_keys[start:start + REFERENCE_BATCH_SIZE], features.cpu()))
                     
                     categories.append(category_folder)
-                    reference_features.append(features)
+                    reference_features.append(torch.cat(parts, dim=0))
                     
-                    logger.info(f"Loaded {len(category_images)} images for {category_folder}")
+                    logger.info(f"Loaded {len(cached_features) + len(category_images)} images for "
+                                f"{category_folder} ({len(cached_features)} from cache)")
                     
                 except Exception as e:
                     logger.error(f"Failed to process category {category_folder}: {e}")
                     continue
         
-        return categories, reference_features
+        self._build_reference_bank(reference_features)
+        return categories
+    
+    def _reference_cache_path(self):
+        return os.path.join(self.reference_dir, REFERENCE_CACHE_FILE)
+    
+    def _load_reference_cache(self):
+        """Load cached reference features as a dict keyed by (category, filename, mtime)"""
+        cache_path = self._reference_cache_path()
+        if not self.use_cache or not os.path.exists(cache_path):
+            return {}
+        
+        try:
+            cache = torch.load(cache_path, map_location='cpu')
+            if cache.get('model_name') != self.model_name:
+                logger.info(f"Ignoring reference cache built for {cache.get('model_name')}")
+                return {}
+            return {tuple(key): features for key, features in zip(cache['keys'], cache['features'])}
+        except Exception as e:
+            logger.warning(f"Failed to read reference cache {cache_path}: {e}")
+            return {}
+    
+    def _save_reference_cache(self, cache, fresh_cache):
+        """Write reference features to the cache file in a single torch.save if they changed"""
+        if not self.use_cache or not os.path.isdir(self.reference_dir):
+            return
+        if fresh_cache.keys() == cache.keys():
+            return
+        
+        cache_path = self._reference_cache_path()
+        keys = list(fresh_cache)
+        try:
+            tmp_path = cache_path + '.tmp'
+            torch.save({
+                'model_name': self.model_name,
+                'keys': keys,
+                'features': torch.stack([fresh_cache[key] for key in keys]) if keys else torch.empty(0)
+            }, tmp_path)
+            os.replace(tmp_path, cache_path)
+            logger.info(f"Saved {len(keys)} reference features to {cache_path}")
+        except Exception as e:
+            logger.warning(f"Failed to write reference cache {cache_path}: {e}")
+    
+    def _build_reference_bank(self, reference_features):
+        """
+        Concatenate per-category features into one contiguous matrix
+        
+        Sets self.all_ref_features [N_total, D] in the model dtype (FP16 on CUDA)
+        and self.ref_category_ids [N_total] mapping each row to its category.
+        Rows are L2-normalized when encoded (cached rows were saved normalized),
+        so they are never normalized again at classification time.
+        """
+        if reference_features:
+            self.all_ref_features = torch.cat(reference_features, dim=0).to(
+                self.device, dtype=self.model.dtype
+            ).contiguous()
+            self.ref_category_ids = torch.cat([
+                torch.full((features.shape[0],), i, dtype=torch.long, device=self.device)
+                for i, features in enumerate(reference_features)
+            ])
+        else:
+            self.all_ref_features = torch.empty((0, 0), dtype=self.model.dtype, device=self.device)
+            self.ref_category_ids = torch.empty((0,), dtype=torch.long, device=self.device)
+        
+        # On CPU the Numba kernel avoids PyTorch dispatch overhead for these small matrices
+        self.use_numba = NUMBA_AVAILABLE and self.device == "cpu"
+        if self.use_numba:
+            self.ref_features_np = np.ascontiguousarray(self.all_ref_features.numpy(), dtype=np.float32)
+            self.ref_offsets_np = np.cumsum(
+                [0] + [features.shape[0] for features in reference_features]
+            ).astype(np.int64)
+    
+    def _category_similarities(self, image_features):
+        """
+        Compute the best reference similarity per category
+        
+        Both the image features and the reference bank are L2-normalized, so a
+        plain dot product gives the cosine similarity without recomputing norms.
+        
+        Args:
+            image_features: L2-normalized image features of shape [B, D]
+            
+        Returns:
+            Tensor of shape [B, num_categories] with the max similarity per category
+        """
+        if self.use_numba:
+            image_features_np = np.ascontiguousarray(image_features.numpy(), dtype=np.float32)
+            return torch.from_numpy(
+                _max_similarity_per_category(image_features_np, self.ref_features_np, self.ref_offsets_np)
+            )
+        
+        sims = image_features @ self.all_ref_features.T
+        index = self.ref_category_ids.unsqueeze(0).expand_as(sims)
+        max_per_cat = torch.full(
+            (sims.shape[0], len(self.categories)), float('-inf'),
+            dtype=sims.dtype, device=sims.device
+        )
+        return max_per_cat.scatter_reduce_(1, index, sims, reduce='amax')
     
     def _create_enhanced_prompts(self, category):
         """Create enhanced text prompts for better classification"""
@@ -138,6 +465,306 @@ class EnhancedGarmentClassifier:
         
         return base_prompts
     
+    def _rank_categories(self, max_per_cat):
+        """
+        Sort categories by similarity on the device
+        
+        Args:
+            max_per_cat: Tensor of shape [B, num_categories]
+            
+        Returns:
+            (scores, indices) as nested lists, sorted by descending similarity,
+            transferred to the host in one go
+        """
+        scores, indices = max_per_cat.float().sort(dim=-1, descending=True)
+        return scores.cpu().tolist(), indices.cpu().tolist()
+    
+    def _build_result(self, image_path, ranked_scores, ranked_indices, top_k=3):
+        """Turn a ranked list of category scores into a classification result dict"""
+        similarities = [(self.categories[i], score) for i, score in zip(ranked_indices, ranked_scores)]
+        
+        # Get top predictions
+        top_predictions = []
+        for category, confidence in similarities[:top_k]:
+            top_predictions.append({
+                'category': category,
+                'confidence': confidence,
+                'is_garment': confidence >= self.confidence_threshold
+            })
+        
+        # Determine final classification
+        best_match = top_predictions[0]
+        final_category = best_match['category'] if best_match['is_garment'] else 'Others'
+        final_confidence = best_match['confidence']
+        
+        return {
+            'image_path': image_path,
+            'final_classification': final_category,
+            'confidence': final_confidence,
+            'is_garment': best_match['is_garment'],
+            'top_predictions': top_predictions,
+            'all_similarities': similarities
+        }
+    
+    def _error_result(self, image_path, error):
+        """Result dict for an image that could not be classified"""
+        return {
+            'image_path': image_path,
+            'final_classification': 'Error',
+            'confidence': 0.0,
+            'is_garment': False,
+            'error': str(error)
+        }
+    
+    def _maybe_export_onnx(self):
+        """Export the visual encoder to ONNX if needed and open an ONNX Runtime session"""
+        if not ONNXRUNTIME_AVAILABLE:
+            logger.warning("onnxruntime is not installed, using PyTorch for the visual encoder")
+            return
+        
+        onnx_path = os.path.join(self.reference_dir, ONNX_MODEL_FILE)
+        try:
+            if not os.path.exists(onnx_path):
+                logger.info(f"Exporting CLIP visual encoder to {onnx_path}...")
+                # Export an FP32 copy on the CPU so the graph runs on any provider
+                visual = copy.deepcopy(self.model.visual).float().cpu()
+                dummy_batch = torch.randn(16, 3, CLIP_INPUT_SIZE, CLIP_INPUT_SIZE)
+                torch.onnx.export(
+                    visual, dummy_batch, onnx_path,
+                    input_names=['input'], output_names=['output'],
+                    dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+                    opset_version=17
+                )
+            
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+                         if p in onnxruntime.get_available_providers()]
+            self.ort_session = onnxruntime.InferenceSession(onnx_path, options, providers=providers)
+            logger.info(f"Using ONNX Runtime for the visual encoder ({providers[0]})")
+        except Exception as e:
+            logger.warning(f"Failed to set up ONNX Runtime, using PyTorch instead: {e}")
+            self.ort_session = None
+    
+    def _encode_image(self, images_tensor):
+        """Run the visual encoder with ONNX Runtime or PyTorch, returning unnormalized features"""
+        if self.ort_session is None:
+            if self.device == "cuda":
+                images_tensor = images_tensor.contiguous(memory_format=torch.channels_last)
+            if not self.compiled:
+                return self.model.encode_image(images_tensor)
+            try:
+                return self.model.encode_image(images_tensor)
+            except Exception as e:
+                # e.g. Triton or a C compiler missing on this host
+                logger.warning(f"Compiled visual encoder failed, falling back to eager mode: {e}")
+                self.model.visual = self._eager_visual
+                self.compiled = False
+                return self.model.encode_image(images_tensor)
+        
+        (features,) = self.ort_session.run(None, {'input': images_tensor.float().cpu().numpy()})
+        return torch.from_numpy(features).to(self.device, dtype=self.model.dtype)
+    
+    def _preprocess_jpeg_on_gpu(self, data, source):
+        """
+        Decode and preprocess encoded JPEG bytes on the GPU
+        
+        Args:
+            data: uint8 tensor with the encoded JPEG
+            source: Path or file object of the image, used for the PIL fallback
+            
+        Returns:
+            Preprocessed image of shape [3, 224, 224] on the device
+        """
+        try:
+            image = decode_jpeg(data, mode=ImageReadMode.RGB, device=self.device)
+        except Exception:
+            # e.g. CMYK or progressive JPEGs unsupported by nvjpeg
+            return self.preprocess(_open_image(source)).to(self.device)
+        # Clamp bicubic overshoot like PIL does for 8-bit images
+        return self._gpu_normalize(self._gpu_transform(image).clamp_(0, 1))
+    
+    def _preprocess_path(self, image_path):
+        """Load and preprocess a single image file onto the device"""
+        if self.gpu_preprocess:
+            data = read_file(image_path)
+            if _is_jpeg(data):
+                return self._preprocess_jpeg_on_gpu(data, image_path)
+        return self.preprocess(_open_image(image_path)).to(self.device)
+    
+    def _preprocess_bytes(self, image_bytes, to_device=True):
+        """
+        Preprocess an encoded image held in memory onto the device
+        
+        With to_device=False, images preprocessed by PIL stay on the CPU so the
+        caller can batch their host-to-device copies; GPU-decoded JPEGs are
+        always returned on the device.
+        """
+        if self.gpu_preprocess:
+            data = torch.frombuffer(bytearray(image_bytes), dtype=torch.uint8)
+            if _is_jpeg(data):
+                return self._preprocess_jpeg_on_gpu(data, io.BytesIO(image_bytes))
+        image = self.preprocess(_open_image(io.BytesIO(image_bytes)))
+        return image.to(self.device) if to_device else image
+    
+    def _encode_paths(self, image_paths, batch_size=16, num_workers=None):
+        """
+        Encode images in batches of batch_size
+        
+        Decoding and preprocessing run in DataLoader worker processes so they
+        overlap with encode_image on the main process. With gpu_preprocess the
+        workers only read JPEG bytes, which are decoded on the GPU.
+        
+        Args:
+            image_paths: List of image paths
+            batch_size: Number of images per encode_image call
+            num_workers: DataLoader worker processes (default: half the CPU count)
+            
+        Returns:
+            (features, valid_indices, errors) where features is an L2-normalized
+            tensor with one row per entry of valid_indices, and errors maps the
+            index of each unreadable image to its error message
+        """
+        if num_workers is None:
+            num_workers = (os.cpu_count() or 2) // 2
+        # No point starting more workers than there are batches
+        num_workers = min(num_workers, -(-len(image_paths) // batch_size))
+        
+        loader_kwargs = {}
+        if num_workers > 0:
+            loader_kwargs['prefetch_factor'] = 2
+        loader = DataLoader(
+            _PathDataset(image_paths, self.preprocess, raw_jpeg=self.gpu_preprocess),
+            batch_size=batch_size,
+            num_workers=num_workers,
+            collate_fn=_collate_images,
+            pin_memory=self.device == "cuda",
+            **loader_kwargs
+        )
+        
+        features = []
+        valid_indices = []
+        errors = {}
+        
+        done = 0
+        for chunk_indices, images_tensor, jpeg_indices, jpegs, chunk_errors in loader:
+            chunk_size = len(chunk_indices) + len(jpeg_indices) + len(chunk_errors)
+            logger.info(f"Encoding images {done + 1}-{done + chunk_size}/{len(image_paths)}")
+            done += chunk_size
+            
+            parts = []
+            if images_tensor is not None:
+                parts.append(images_tensor.to(self.device, non_blocking=True))
+            
+            jpeg_images = []
+            for i, data in zip(jpeg_indices, jpegs):
+                try:
+                    jpeg_images.append(self._preprocess_jpeg_on_gpu(data, image_paths[i]))
+                    chunk_indices.append(i)
+                except Exception as e:
+                    chunk_errors[i] = str(e)
+            if jpeg_images:
+                parts.append(torch.stack(jpeg_images))
+            
+            for i, error in chunk_errors.items():
+                logger.error(f"Error loading {image_paths[i]}: {error}")
+            errors.update(chunk_errors)
+            
+            if not chunk_indices:
+                continue
+            
+            features.append(self._encode_stacked(torch.cat(parts, dim=0), batch_size))
+            valid_indices.extend(chunk_indices)
+        
+        features = torch.cat(features, dim=0) if features else None
+        return features, valid_indices, errors
+    
+    def _encode_stacked(self, images_tensor, batch_size):
+        """
+        Encode a stack of at most batch_size preprocessed images in one forward pass
+        
+        Returns:
+            L2-normalized features with one row per input image
+        """
+        images_tensor = images_tensor.to(self.device, dtype=self.model.dtype)
+        num_images = images_tensor.shape[0]
+        if self.compiled and num_images < batch_size:
+            # Pad partial batches to the compiled shape to avoid recompiling
+            padding = images_tensor.new_zeros((batch_size - num_images, *images_tensor.shape[1:]))
+            images_tensor = torch.cat([images_tensor, padding], dim=0)
+        with torch.inference_mode():
+            features = self._encode_image(images_tensor)[:num_images]
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features
+    
+    def _batch_buffer(self, batch_size):
+        """
+        Input tensors of shape [batch_size, 3, 224, 224], reused across calls
+        
+        Returns the device buffer and, on CUDA, a pinned host buffer used to stage
+        CPU-preprocessed images for asynchronous upload (None on CPU). Rows beyond
+        the images of a partial batch hold stale data; callers only keep the
+        features of the rows they filled.
+        """
+        if self._input_buf is None or self._input_buf.shape[0] < batch_size:
+            shape = (batch_size, 3, CLIP_INPUT_SIZE, CLIP_INPUT_SIZE)
+            self._input_buf = torch.zeros(shape, device=self.device, dtype=self.model.dtype)
+            if self.device == "cuda":
+                self._pinned_buf = torch.empty(shape, dtype=self.model.dtype).pin_memory()
+        pinned = self._pinned_buf[:batch_size] if self._pinned_buf is not None else None
+        return self._input_buf[:batch_size], pinned
+    
+    def _upload_rows(self, buffer, pinned, rows):
+        """
+        Copy rows of the pinned host buffer into the device buffer asynchronously
+        
+        The copies run on a dedicated stream that first waits for earlier work
+        reading the device buffer; the current stream then waits for the copies
+        before encoding, while the CPU goes on decoding the next images.
+        """
+        if self._copy_stream is None:
+            self._copy_stream = torch.cuda.Stream()
+        current_stream = torch.cuda.current_stream()
+        self._copy_stream.wait_stream(current_stream)
+        with torch.cuda.stream(self._copy_stream):
+            for row in rows:
+                buffer[row].copy_(pinned[row], non_blocking=True)
+        current_stream.wait_stream(self._copy_stream)
+    
+    def _encode_path(self, image_path, mtime_ns=None, size=None):
+        """
+        Encode a single image file
+        
+        mtime_ns and size are only part of the cache key used by _embed_path,
+        so a modified file is re-encoded.
+        
+        Returns:
+            L2-normalized features of shape [1, D]
+        """
+        return self._encode_preprocessed(self._preprocess_path(image_path))
+    
+    def _encode_preprocessed(self, image):
+        """
+        Encode one preprocessed image of shape [3, 224, 224]
+        
+        Returns:
+            L2-normalized features of shape [1, D]
+        """
+        image_input = image.unsqueeze(0).to(self.device, dtype=self.model.dtype)
+        
+        with torch.inference_mode():
+            image_features = self._encode_image(image_input)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        return image_features
+    
+    def _classify_features(self, image_path, image_features, top_k=3):
+        """Classify L2-normalized features of shape [1, D]"""
+        # Calculate similarities with all reference categories in one matmul,
+        # taking the maximum similarity over each category's reference images
+        max_per_cat = self._category_similarities(image_features)
+        ranked_scores, ranked_indices = self._rank_categories(max_per_cat)
+        return self._build_result(image_path, ranked_scores[0], ranked_indices[0], top_k)
+    
     def classify_image(self, image_path, top_k=3):
         """
         Classify a single image
@@ -150,82 +777,222 @@ class EnhancedGarmentClassifier:
             dict with classification results
         """
         try:
-            # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
-            image_input = self.preprocess(image).unsqueeze(0).to(self.device)
+            # Extract image features, reusing them if this file was seen before
+            stat = os.stat(image_path)
+            image_features = self._embed_path(image_path, stat.st_mtime_ns, stat.st_size)
+            return self._classify_features(image_path, image_features, top_k)
             
-            # Extract image features
-            with torch.no_grad():
-                image_features = self.model.encode_image(image_input)
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        except Exception as e:
+            logger.error(f"Error classifying {image_path}: {e}")
+            return self._error_result(image_path, e)
+    
+    def classify_image_bytes(self, image_bytes, top_k=3, image_path=None):
+        """
+        Classify an encoded image held in memory
+        
+        Args:
+            image_bytes: Encoded image data (e.g. a downloaded JPEG)
+            top_k: Number of top predictions to return
+            image_path: Label stored as 'image_path' in the result, such as the source URL
             
-            # Calculate similarities with all reference categories
-            similarities = []
-            for i, category in enumerate(self.categories):
-                category_features = self.reference_features[i]
-                
-                # Calculate similarity with all reference images in this category
-                category_similarities = torch.cosine_similarity(
-                    image_features, category_features, dim=-1
-                )
-                
-                # Take the maximum similarity for this category
-                max_similarity = category_similarities.max().item()
-                similarities.append((category, max_similarity))
+        Returns:
+            dict with classification results
+        """
+        try:
+            image_features = self._encode_preprocessed(self._preprocess_bytes(image_bytes))
+            return self._classify_features(image_path, image_features, top_k)
             
-            # Sort by similarity
-            similarities.sort(key=lambda x: x[1], reverse=True)
+        except Exception as e:
+            logger.error(f"Error classifying {image_path or 'image bytes'}: {e}")
+            return self._error_result(image_path, e)
+    
+    def classify_batch(self, image_paths, top_k=3, batch_size=16, num_workers=None):
+        """
+        Classify multiple images
+        
+        Args:
+            image_paths: List of image paths
+            top_k: Number of top predictions to return
+            batch_size: Number of images encoded per forward pass
+            num_workers: Worker processes for image loading (default: half the CPU count)
             
-            # Get top predictions
-            top_predictions = []
-            for category, confidence in similarities[:top_k]:
-                top_predictions.append({
-                    'category': category,
-                    'confidence': confidence,
-                    'is_garment': confidence >= self.confidence_threshold
-                })
+        Returns:
+            List of classification results, in the same order as image_paths
+        """
+        results = [None] * len(image_paths)
+        
+        try:
+            features, valid_indices, errors = self._encode_paths(image_paths, batch_size, num_workers)
             
-            # Determine final classification
-            best_match = top_predictions[0]
-            final_category = best_match['category'] if best_match['is_garment'] else 'Others'
-            final_confidence = best_match['confidence']
+            # One [B, num_categories] similarity matrix for the whole batch
+            ranked_scores, ranked_indices = [], []
+            if valid_indices:
+                max_per_cat = self._category_similarities(features)
+                ranked_scores, ranked_indices = self._rank_categories(max_per_cat)
+        except Exception as e:
+            logger.error(f"Error classifying batch: {e}")
+            return [self._error_result(image_path, e) for image_path in image_paths]
+        
+        for i, error in errors.items():
+            results[i] = self._error_result(image_paths[i], error)
+        
+        for i, scores, indices in zip(valid_indices, ranked_scores, ranked_indices):
+            try:
+                results[i] = self._build_result(image_paths[i], scores, indices, top_k)
+            except Exception as e:
+                logger.error(f"Error classifying {image_paths[i]}: {e}")
+                results[i] = self._error_result(image_paths[i], e)
+        
+        return results
+    
+    def _try_preprocess_bytes(self, image_bytes):
+        """_preprocess_bytes returning (image, None), or (None, error) on failure"""
+        try:
+            return self._preprocess_bytes(image_bytes, to_device=False), None
+        except Exception as e:
+            return None, e
+    
+    def _iter_preprocessed(self, executor, images, batch_size):
+        """
+        Yield _try_preprocess_bytes results in input order
+        
+        Images are submitted one chunk of batch_size at a time, and the chunk
+        after the one being consumed is submitted before it is yielded. With
+        the chunk the caller is still encoding, up to three chunks of decoded
+        images can be alive at once.
+        """
+        pending = deque()
+        for start in range(0, len(images), batch_size):
+            pending.append([executor.submit(self._try_preprocess_bytes, image_bytes)
+                            for image_bytes in images[start:start + batch_size]])
+            if len(pending) == 2:
+                yield from (future.result() for future in pending.popleft())
+        while pending:
+            yield from (future.result() for future in pending.popleft())
+    
+    def preprocess_bytes_batch(self, images, num_workers=None):
+        """
+        Decode and preprocess multiple encoded images on a thread pool
+        
+        PIL releases the GIL while decoding and resizing. Call this ahead of
+        classify_preprocessed_batch, e.g. on a prefetch thread, so decoding the
+        next batch overlaps with the forward pass of the current one.
+        
+        Args:
+            images: List of encoded image data (e.g. downloaded JPEGs)
+            num_workers: Preprocessing threads (default: the CPU count)
             
-            return {
-                'image_path': image_path,
-                'final_classification': final_category,
-                'confidence': final_confidence,
-                'is_garment': best_match['is_garment'],
-                'top_predictions': top_predictions,
-                'all_similarities': similarities
-            }
+        Returns:
+            List of (image, None), or (None, error) for images that failed to load,
+            in the same order as images
+        """
+        if not images:
+            return []
+        num_workers = min(num_workers or os.cpu_count() or 1, len(images))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            return list(executor.map(self._try_preprocess_bytes, images))
+    
+    def classify_preprocessed_batch(self, preprocessed, top_k=3, image_paths=None, batch_size=16):
+        """
+        Classify images returned by preprocess_bytes_batch
+        
+        Args:
+            preprocessed: List of (image, error) pairs from preprocess_bytes_batch
+            top_k: Number of top predictions to return
+            image_paths: Labels stored as 'image_path' in the results, such as the source URLs
+            batch_size: Number of images encoded per forward pass
             
-        except Exception as e:
-            logger.error(f"Error classifying {image_path}: {e}")
-            return {
-                'image_path': image_path,
-                'final_classification': 'Error',
-                'confidence': 0.0,
-                'is_garment': False,
-                'error': str(e)
-            }
+        Returns:
+            List of classification results, in the same order as preprocessed
+        """
+        return self._classify_preprocessed(preprocessed, len(preprocessed), top_k, image_paths, batch_size)
     
-    def classify_batch(self, image_paths, top_k=3):
+    def classify_bytes_batch(self, images, top_k=3, image_paths=None, batch_size=16, num_workers=None):
         """
-        Classify multiple images
+        Classify multiple encoded images held in memory
+        
+        Images are decoded and preprocessed by a thread pool while the main thread
+        encodes them batch_size at a time, so decoding the next chunk overlaps with
+        the forward pass of the current one. Memory is bounded by about three chunks.
         
         Args:
-            image_paths: List of image paths
+            images: List of encoded image data (e.g. downloaded JPEGs)
             top_k: Number of top predictions to return
+            image_paths: Labels stored as 'image_path' in the results, such as the source URLs
+            batch_size: Number of images encoded per forward pass
+            num_workers: Preprocessing threads (default: the CPU count)
             
         Returns:
-            List of classification results
+            List of classification results, in the same order as images
         """
-        results = []
+        if not images:
+            return []
         
-        for i, image_path in enumerate(image_paths):
-            logger.info(f"Classifying {i+1}/{len(image_paths)}: {os.path.basename(image_path)}")
-            result = self.classify_image(image_path, top_k)
-            results.append(result)
+        num_workers = min(num_workers or os.cpu_count() or 1, len(images))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            preprocessed = self._iter_preprocessed(executor, images, batch_size)
+            return self._classify_preprocessed(preprocessed, len(images), top_k, image_paths, batch_size)
+    
+    def _classify_preprocessed(self, preprocessed, num_total, top_k, image_paths, batch_size):
+        """
+        Encode (image, error) pairs batch_size at a time and classify them
+        
+        preprocessed may be a lazy iterator; each chunk is consumed only when
+        its forward pass is about to run.
+        """
+        if image_paths is None:
+            image_paths = [None] * num_total
+        results = [None] * num_total
+        if not num_total:
+            return results
+        
+        preprocessed = enumerate(preprocessed)
+        features, valid_indices = [], []
+        try:
+            # The input buffers are shared across calls, so one caller fills and encodes at a time
+            with self._buffer_lock:
+                buffer, pinned = self._batch_buffer(batch_size)
+                for _ in range(0, num_total, batch_size):
+                    chunk_indices, host_rows = [], []
+                    if self._copy_stream is not None:
+                        # The previous chunk's copies must finish before its pinned rows are reused
+                        self._copy_stream.synchronize()
+                    for i, (image, error) in islice(preprocessed, batch_size):
+                        if image is None:
+                            logger.error(f"Error loading {image_paths[i] or 'image bytes'}: {error}")
+                            results[i] = self._error_result(image_paths[i], error)
+                            continue
+                        # Fill the reused input buffer in place instead of stacking
+                        row = len(chunk_indices)
+                        if pinned is not None and not image.is_cuda:
+                            pinned[row].copy_(image)
+                            host_rows.append(row)
+                        else:
+                            buffer[row].copy_(image)
+                        chunk_indices.append(i)
+                    if host_rows:
+                        self._upload_rows(buffer, pinned, host_rows)
+                    if chunk_indices:
+                        num_images = len(chunk_indices)
+                        # A compiled encoder gets the whole buffer, so no padding is allocated
+                        images_tensor = buffer if self.compiled else buffer[:num_images]
+                        features.append(self._encode_stacked(images_tensor, batch_size)[:num_images])
+                        valid_indices.extend(chunk_indices)
+            
+            ranked_scores, ranked_indices = [], []
+            if valid_indices:
+                max_per_cat = self._category_similarities(torch.cat(features, dim=0))
+                ranked_scores, ranked_indices = self._rank_categories(max_per_cat)
+        except Exception as e:
+            logger.error(f"Error classifying batch: {e}")
+            return [result or self._error_result(image_paths[i], e) for i, result in enumerate(results)]
+        
+        for i, scores, indices in zip(valid_indices, ranked_scores, ranked_indices):
+            try:
+                results[i] = self._build_result(image_paths[i], scores, indices, top_k)
+            except Exception as e:
+                logger.error(f"Error classifying {image_paths[i] or 'image bytes'}: {e}")
+                results[i] = self._error_result(image_paths[i], e)
         
         return results
     
@@ -239,34 +1006,29 @@ class EnhancedGarmentClassifier:
         Returns:
             dict with accuracy metrics
         """
-        correct = 0
         total = len(test_data)
-        category_accuracy = {}
         
-        for item in test_data:
-            result = self.classify_image(item['image_path'])
-            predicted = result['final_classification']
-            true_category = item['true_category']
-            
-            if predicted == true_category:
-                correct += 1
-            
-            # Track per-category accuracy
-            if true_category not in category_accuracy:
-                category_accuracy[true_category] = {'correct': 0, 'total': 0}
-            
-            category_accuracy[true_category]['total'] += 1
-            if predicted == true_category:
-                category_accuracy[true_category]['correct'] += 1
+        # Classify everything in batches, then score with array comparisons
+        results = self.classify_batch([item['image_path'] for item in test_data])
+        truths = np.array([item['true_category'] for item in test_data], dtype=object)
+        predictions = np.array([result['final_classification'] for result in results], dtype=object)
+        correct_mask = predictions == truths
+        correct = int(correct_mask.sum())
         
         # Calculate overall accuracy
         overall_accuracy = correct / total if total > 0 else 0
         
         # Calculate per-category accuracy
-        for category in category_accuracy:
-            cat_total = category_accuracy[category]['total']
-            cat_correct = category_accuracy[category]['correct']
-            category_accuracy[category]['accuracy'] = cat_correct / cat_total if cat_total > 0 else 0
+        category_accuracy = {}
+        for category in np.unique(truths):
+            category_mask = truths == category
+            cat_correct = int(correct_mask[category_mask].sum())
+            cat_total = int(category_mask.sum())
+            category_accuracy[category] = {
+                'correct': cat_correct,
+                'total': cat_total,
+                'accuracy': cat_correct / cat_total
+            }
         
         return {
             'overall_accuracy': overall_accuracy,
@@ -5,24 +5,246 @@ Classifies garment images from PostgreSQL database and updates garment_title and
 """
 
 import os
+import io
+import csv
 import json
-import psycopg2
-import pandas as pd
+import random
+import zlib
+from bisect import bisect_right
+from functools import lru_cache
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
 from pathlib import Path
 from collections import Counter
 import numpy as np
 import logging
-import tempfile
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
-from enhanced_garment_classifier import EnhancedGarmentClassifier
+from types import MappingProxyType
+try:
+    from .enhanced_garment_classifier import EnhancedGarmentClassifier
+except ImportError:
+    # Running this module directly as a script
+    from enhanced_garment_classifier import EnhancedGarmentClassifier
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Maximum number of concurrent image downloads per batch
+MAX_DOWNLOAD_WORKERS = 16
+
+def _json_line(data):
+    """Serialize one result as a line of NDJSON."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(data).encode() + b"\n"
+
+# Broad categories, in the order they are matched against a specific category name;
+# earlier entries win, e.g. "Cape_Lehenga" → "Lehenga" and "Saree_Gown" → "Saree"
+BROAD_CATEGORIES = (
+    "Lehenga", "Saree", "Kurti", "Gown", "Suit", "Choli", "Cape", "Salwar_Kameez",
+    "Traditional", "Others", "Electronics", "Furniture",
+)
+
+# Specific categories whose broad category does not appear in their name (read-only)
+BROAD_CATEGORY_MAPPING = MappingProxyType({
+    "Mundum_Neriyathum": "Traditional",
+    "Mekhela_Sador": "Traditional",
+    "Blazer_+_Skirt_Set": "Suit",
+    "Top_+_Skirt_Set": "Suit",
+    "Coord_Set_(Generic)": "Suit",
+    "Indo-Western_Coord_Set": "Suit",
+})
+
+@lru_cache(maxsize=256)
+def _broad_category(specific_category):
+    """Map a specific category to its broad category, or return it unchanged."""
+    if specific_category in BROAD_CATEGORY_MAPPING:
+        return BROAD_CATEGORY_MAPPING[specific_category]
+    for broad_category in BROAD_CATEGORIES:
+        if broad_category in specific_category:
+            return broad_category
+    return specific_category
+
+
+def _identifier(name):
+    """Quote a table or column name, keeping an optional schema prefix separate."""
+    return sql.Identifier(*name.split('.'))
+
+@lru_cache(maxsize=None)
+def _select_images_sql(table_name, id_column, image_column, where_clause, ordered):
+    """SELECT for the rows still to process, composed once per table/filter."""
+    id_ = _identifier(id_column)
+    return sql.SQL("""
+        SELECT {id}, {img}
+        FROM {table}
+        WHERE {img} IS NOT NULL
+        AND {img} != ''
+        {where}
+        {order_by};
+    """).format(
+        id=id_,
+        img=_identifier(image_column),
+        table=_identifier(table_name),
+        where=sql.SQL(f"AND {where_clause}" if where_clause else ""),
+        order_by=sql.SQL("ORDER BY {id}").format(id=id_) if ordered else sql.SQL(""),
+    )
+
+@lru_cache(maxsize=None)
+def _update_sql(table_name, id_column):
+    """Single-row UPDATE of title and description, composed once per table."""
+    return sql.SQL("""
+        UPDATE {table}
+        SET garment_title = %s, garment_description = %s
+        WHERE {id} = %s;
+    """).format(table=_identifier(table_name), id=_identifier(id_column))
+
+@lru_cache(maxsize=None)
+def _update_values_sql(table_name, id_column, id_type):
+    """
+    Multi-row UPDATE ... FROM (VALUES %s) for execute_values, composed once per table.
+    
+    VALUES columns are typed from the Python values (uuid keys arrive as str), so the
+    id is cast to the key column's type for the join.
+    """
+    return sql.SQL("""
+        UPDATE {table} AS t
+        SET garment_title = data.title, garment_description = data.description
+        FROM (VALUES %s) AS data(id, title, description)
+        WHERE t.{id} = data.id::{id_type}
+        RETURNING t.{id};
+    """).format(table=_identifier(table_name), id=_identifier(id_column), id_type=sql.SQL(id_type))
+
+@lru_cache(maxsize=None)
+def _prepare_update_sql(table_name, id_column):
+    """PREPARE for the one-by-one update fallback, composed once per table."""
+    return sql.SQL("""
+        PREPARE upd_garment AS
+        UPDATE {table}
+        SET garment_title = $1, garment_description = $2
+        WHERE {id} = $3;
+    """).format(table=_identifier(table_name), id=_identifier(id_column))
+
+@lru_cache(maxsize=None)
+def _copy_merge_sql(table_name, id_column):
+    """Staging table and merge statements for COPY updates, composed once per table."""
+    table, id_ = _identifier(table_name), _identifier(id_column)
+    create_staging = sql.SQL("""
+        CREATE TEMP TABLE tmp_garment_upd ON COMMIT DROP AS
+        SELECT {id} AS id, garment_title AS title, garment_description AS description
+        FROM {table}
+        WITH NO DATA;
+    """).format(table=table, id=id_)
+    merge = sql.SQL("""
+        UPDATE {table} AS t
+        SET garment_title = s.title, garment_description = s.description
+        FROM tmp_garment_upd AS s
+        WHERE t.{id} = s.id;
+    """).format(table=table, id=id_)
+    return create_staging, merge
+
+# Lower bounds of confidence tiers 1-3; tier 0 is everything below 0.5
+_TIER_FLOORS = (0.5, 0.7, 0.9)
+
+# Title adjectives indexed by confidence tier
+_ADJ_TIERS = (
+    ("Unique", "Distinctive", "Special", "Notable", "Remarkable", "Unusual", "Extraordinary"),
+    ("Classic", "Timeless", "Versatile", "Refined", "Elegant", "Traditional", "Sophisticated"),
+    ("Stylish", "Fashionable", "Chic", "Modern", "Sophisticated", "Trendy", "Contemporary"),
+    ("Exquisite", "Magnificent", "Breathtaking", "Gorgeous", "Stunning", "Elegant", "Beautiful"),
+)
+_TITLE_TEMPLATES = (
+    "{a} {c}",
+    "{c} - {a} Design",
+    "{a} {c} Collection",
+    "{c} - {a} Style",
+    "{a} {c} Ensemble",
+    "{c} - {a} Piece",
+    "{a} {c} Attire",
+    "{c} - {a} Look",
+    "{a} {c} Outfit",
+    "{c} - {a} Fashion",
+    "{a} {c} Wear",
+    "{c} - {a} Choice",
+    "{a} {c} Selection",
+    "{c} - {a} Creation",
+    "{a} {c} Masterpiece",
+)
+
+# Description (style phrases, appeal phrases) indexed by confidence tier
+_DESCRIPTION_TIERS = (
+    (("uniquely styled", "distinctively crafted", "specially designed",
+      "unusually made", "notably created", "remarkably tailored"),
+     ("Offers a distinctive take on traditional fashion.",
+      "Stands out in the world of ethnic wear.",
+      "Brings a fresh perspective to classic fashion.")),
+    (("well-crafted", "carefully designed", "thoughtfully styled",
+      "skillfully made", "attractively created", "nicely tailored"),
+     ("Captures the essence of traditional Indian fashion beautifully.",
+      "Showcases the timeless appeal of ethnic wear.",
+      "Offers a wonderful introduction to authentic fashion.")),
+    (("beautifully designed", "elegantly crafted", "sophisticatedly styled",
+      "professionally made", "artistically created", "carefully tailored"),
+     ("Perfectly balances traditional charm with modern sophistication.",
+      "A stunning example of contemporary Indian fashion.",
+      "Offers the perfect blend of cultural heritage and style.")),
+    (("exquisitely crafted", "masterfully designed", "breathtakingly beautiful",
+      "artistically rendered", "professionally tailored", "luxuriously styled"),
+     ("A true masterpiece that celebrates rich heritage.",
+      "This piece showcases the finest in ethnic fashion.",
+      "A stunning example of contemporary elegance.")),
+)
+
+# Number of distinct phrase picks per (category, tier); records are spread over them by ID
+TITLE_VARIANTS = 64
+
+def _confidence_tier(confidence):
+    """Bucket a confidence score into tier 0 (< 0.5) through 3 (>= 0.9)."""
+    return bisect_right(_TIER_FLOORS, confidence)
+
+def _variant_seed(record_id):
+    """Map a record ID to a stable phrase variant."""
+    if not isinstance(record_id, int):
+        record_id = zlib.crc32(str(record_id).encode())
+    return record_id % TITLE_VARIANTS
+
+@lru_cache(maxsize=4096)
+def _title(category, tier, seed):
+    """Build the title for a broad category, confidence tier and variant seed."""
+    rng = random.Random(seed)
+    adjective = rng.choice(_ADJ_TIERS[tier])
+    template = rng.choice(_TITLE_TEMPLATES)
+    return template.format(a=adjective, c=category.replace('_', ' ').title())[:150]
+
+@lru_cache(maxsize=4096)
+def _description(category, tier, seed):
+    """Build the description for a broad category, confidence tier and variant seed."""
+    rng = random.Random(seed)
+    style_phrases, appeal_phrases = _DESCRIPTION_TIERS[tier]
+    readable_category = category.replace('_', ' ').lower()
+    
+    # Create shorter, natural description (max 200 characters)
+    description = f"A {rng.choice(style_phrases)} {readable_category}. {rng.choice(appeal_phrases)}"
+    if len(description) > 200:
+        description = f"Beautiful {readable_category} with elegant design."
+    
+    return description[:200]
+
 class PostgresGarmentClassifier:
-    def __init__(self, db_config, confidence_threshold=0.15, backup_table=True):
+    def __init__(self, db_config, confidence_threshold=0.15, backup_table=True, pool_size=16,
+                 use_onnx=None):
         """
         Initialize the PostgreSQL garment classifier.
         
@@ -37,21 +259,65 @@ class PostgresGarmentClassifier:
                 }
             confidence_threshold (float): Minimum confidence for classification
             backup_table (bool): Whether to create a backup table before updates
+            pool_size (int): Maximum number of pooled database connections; at least 2, since
+                a run streams rows on one connection while writing updates on another
+            use_onnx (bool): Run the CLIP visual encoder with ONNX Runtime; None (default) does so
+                on CPU-only hosts when onnxruntime is installed
         """
+        if pool_size < 2:
+            raise ValueError(f"pool_size must be at least 2, got {pool_size}")
+        
         self.db_config = db_config
-        self.classifier = EnhancedGarmentClassifier(confidence_threshold=confidence_threshold)
+        self.classifier = EnhancedGarmentClassifier(confidence_threshold=confidence_threshold,
+                                                    use_onnx=use_onnx)
         self.backup_table = backup_table
+        self._pool = None
+        # SQL type of each (table, id column) used by batched updates
+        self._id_types = {}
         
-        # Category mapping for broad categories
-        self.broad_category_mapping = self.get_broad_category_mapping()
+        # Keep-alive HTTP session shared by all download threads
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=3)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        
+        # Open the two connections a run uses at once (row stream and update writer)
+        # up front, and reuse connections across calls
+        try:
+            self._pool = ThreadedConnectionPool(2, pool_size, **self.db_config)
+        except Exception as e:
+            logger.error(f"❌ Failed to connect to database: {e}")
+            raise
         
         # Test database connection
         self.test_connection()
     
+    @contextmanager
+    def _conn(self):
+        """Borrow a pooled connection; commits on success and rolls back on error."""
+        conn = self._pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.putconn(conn)
+    
+    def close(self):
+        """Close all pooled database and HTTP connections."""
+        if self._pool is not None and not self._pool.closed:
+            self._pool.closeall()
+        self._http.close()
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
     def test_connection(self):
         """Test database connection."""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self._conn() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("SELECT version();")
                     version = cursor.fetchone()
@@ -60,106 +326,20 @@ class PostgresGarmentClassifier:
             logger.error(f"❌ Failed to connect to database: {e}")
             raise
     
-    def get_broad_category_mapping(self):
-        """Map specific subcategories to broader categories."""
-        return {
-            # Lehenga variations → Lehenga
-            "Fishtail_Lehenga": "Lehenga",
-            "A-line_Lehenga": "Lehenga", 
-            "Circular_Lehenga": "Lehenga",
-            "Panelled_Lehenga": "Lehenga",
-            "Trail_Lehenga": "Lehenga",
-            "Cape_Lehenga": "Lehenga",
-            "Jacket_Lehenga": "Lehenga",
-            "Indo-Western_Lehenga": "Lehenga",
-            "Lehenga_Choli": "Lehenga",
-            "Crop_Top_with_Lehenga": "Lehenga",
-            "Bralette_+_Lehenga_Set": "Lehenga",
-            
-            # Saree variations → Saree
-            "Banarasi_Saree": "Saree",
-            "Kanjeevaram_Saree": "Saree",
-            "Bandhani_Saree": "Saree",
-            "Paithani_Saree": "Saree",
-            "Chanderi_Saree": "Saree",
-            "Dhoti_Saree": "Saree",
-            "Half_Saree": "Saree",
-            "Pre-stitched_Saree": "Saree",
-            "Saree_Gown": "Saree",
-            "Draped_Saree": "Saree",
-            "Saree_(Generic)": "Saree",
-            
-            # Suit variations → Suit
-            "Punjabi_Suit": "Suit",
-            "Patiala_Suit": "Suit",
-            "Straight_Suit": "Suit",
-            "Churidar_Suit": "Suit",
-            "Anarkali_Suit": "Suit",
-            "Sharara_Suit": "Suit",
-            "Gharara_Suit": "Suit",
-            "Palazzo_Suit": "Suit",
-            "Tulip_Pants_Suit": "Suit",
-            "Pant_Style_Suit": "Suit",
-            "Layered_Suit": "Suit",
-            "Blazer_+_Skirt_Set": "Suit",
-            "Top_+_Skirt_Set": "Suit",
-            "Coord_Set_(Generic)": "Suit",
-            "Indo-Western_Coord_Set": "Suit",
-            
-            # Kurti variations → Kurti
-            "Peplum_Kurti": "Kurti",
-            "Angrakha_Kurti": "Kurti",
-            "Longline_Kurti": "Kurti",
-            "Kaftan_Kurti": "Kurti",
-            "A-line_Kurti": "Kurti",
-            "Cape_Kurti": "Kurti",
-            "Flared_Kurti": "Kurti",
-            "Straight_Kurti": "Kurti",
-            
-            # Gown variations → Gown
-            "Indo-Western_Gown": "Gown",
-            "One-Shoulder_Gown": "Gown",
-            "Ruffle_Gown": "Gown",
-            "Jacket_Gown": "Gown",
-            "Cape_Gown": "Gown",
-            "Ethnic_Gown": "Gown",
-            "Draped_Gown": "Gown",
-            
-            # Choli variations → Choli
-            "Chaniya_Choli": "Choli",
-            
-            # Traditional variations → Traditional
-            "Mundum_Neriyathum": "Traditional",
-            "Mekhela_Sador": "Traditional",
-            
-            # Cape variations → Cape
-            "Cape_+_Dhoti_Set": "Cape",
-            
-            # Keep some specific categories as they are
-            "Salwar_Kameez": "Salwar_Kameez",
-            "Kurti": "Kurti",
-            "Saree": "Saree",
-            "Lehenga": "Lehenga",
-            "Gown": "Gown",
-            "Suit": "Suit",
-            "Choli": "Choli",
-            "Traditional": "Traditional",
-            "Cape": "Cape",
-            "Others": "Others",
-            "Electronics": "Electronics",
-            "Furniture": "Furniture"
-        }
+    def update_confidence_threshold(self, confidence_threshold):
+        """Change the minimum confidence for classification without reloading the model."""
+        self.classifier.confidence_threshold = confidence_threshold
     
     def map_to_broad_category(self, specific_category):
         """Convert specific category to broad category."""
-        return self.broad_category_mapping.get(specific_category, specific_category)
+        return _broad_category(specific_category)
     
     def get_table_schema(self, table_name):
         """Get table schema to understand the structure."""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self._conn() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(f"""
+                    cursor.execute("""
                         SELECT column_name, data_type, is_nullable
                         FROM information_schema.columns
                         WHERE table_name = %s
@@ -171,15 +351,33 @@ class PostgresGarmentClassifier:
             logger.error(f"❌ Failed to get table schema: {e}")
             return []
     
-    def create_backup_table(self, table_name):
-        """Create a backup table before making changes."""
+    def create_backup_table(self, table_name, id_column, title_column="garment_title",
+                            description_column="garment_description"):
+        """
+        Create a backup of the columns this classifier overwrites before making changes.
+        
+        Only the key and the title/description columns are copied, and the backup is
+        indexed on the key so a restore is a cheap join back to the source table.
+        """
         backup_table_name = f"{table_name}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self._conn() as conn:
                 with conn.cursor() as cursor:
                     # Create backup table
-                    cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT * FROM {table_name};")
+                    backup, id_ = _identifier(backup_table_name), _identifier(id_column)
+                    cursor.execute(sql.SQL("""
+                        CREATE TABLE {backup} AS
+                        SELECT {id}, {title}, {description}
+                        FROM {table};
+                    """).format(
+                        backup=backup,
+                        id=id_,
+                        title=_identifier(title_column),
+                        description=_identifier(description_column),
+                        table=_identifier(table_name),
+                    ))
+                    cursor.execute(sql.SQL("CREATE INDEX ON {backup} ({id});").format(backup=backup, id=id_))
                     conn.commit()
                     logger.info(f"✅ Created backup table: {backup_table_name}")
                     return backup_table_name
@@ -187,223 +385,311 @@ class PostgresGarmentClassifier:
             logger.error(f"❌ Failed to create backup table: {e}")
             return None
     
-    def get_images_to_process(self, table_name, image_column, id_column, where_clause=""):
+    def get_images_to_process(self, table_name, image_column, id_column, where_clause="", batch_size=1000,
+                              ordered=False):
         """
-        Get images from database that need processing.
+        Stream images from database that need processing.
+        
+        Rows are read through a server-side cursor, so processing can start as soon as
+        the first rows arrive instead of after the whole result set is loaded.
         
         Args:
             table_name (str): Name of the table
             image_column (str): Column containing image URLs/paths
             id_column (str): Primary key column
             where_clause (str): Optional WHERE clause to filter records
+            batch_size (int): Number of rows fetched from the server per round trip
+            ordered (bool): Return rows sorted by id_column. Off by default because the sort
+                has to finish before the first row is returned
+        
+        Yields:
+            tuple: (record_id, image_url)
         """
         try:
-            with psycopg2.connect(**self.db_config) as conn:
-                query = f"""
-                    SELECT {id_column}, {image_column}
-                    FROM {table_name}
-                    WHERE {image_column} IS NOT NULL 
-                    AND {image_column} != ''
-                    {f'AND {where_clause}' if where_clause else ''}
-                    ORDER BY {id_column};
-                """
+            with self._conn() as conn:
+                query = _select_images_sql(table_name, id_column, image_column, where_clause, ordered)
                 
-                df = pd.read_sql_query(query, conn)
-                logger.info(f"📊 Found {len(df)} images to process in table '{table_name}'")
-                return df
+                with conn.cursor(name='img_cursor') as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query)
+                    yield from cursor
                 
         except Exception as e:
             logger.error(f"❌ Failed to get images from database: {e}")
-            return pd.DataFrame()
     
-    def download_image_from_url(self, image_url, local_path):
-        """Download image from URL to local path."""
+    def download_image_from_url(self, image_url):
+        """Download image from URL into memory, returning its bytes or None on failure."""
         try:
-            response = requests.get(image_url, timeout=30, stream=True)
+            response = self._http.get(image_url, timeout=30)
             response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            return True
+            return response.content
         except Exception as e:
             logger.error(f"❌ Failed to download {image_url}: {e}")
-            return False
+            return None
     
-    def generate_natural_title(self, broad_category, confidence):
-        """Generate a natural, fashion-expert-like title (max 150 characters) with varied phrases."""
-        readable_category = broad_category.replace('_', ' ').title()
-        
-        # Fashion adjectives based on confidence
-        if confidence >= 0.9:
-            adjectives = ["Exquisite", "Magnificent", "Breathtaking", "Gorgeous", "Stunning", "Elegant", "Beautiful"]
-        elif confidence >= 0.7:
-            adjectives = ["Stylish", "Fashionable", "Chic", "Modern", "Sophisticated", "Trendy", "Contemporary"]
-        elif confidence >= 0.5:
-            adjectives = ["Classic", "Timeless", "Versatile", "Refined", "Elegant", "Traditional", "Sophisticated"]
-        else:
-            adjectives = ["Unique", "Distinctive", "Special", "Notable", "Remarkable", "Unusual", "Extraordinary"]
-        
-        import random
-        adjective = random.choice(adjectives)
-        
-        # Create varied title options without repetitive phrases
-        title_variations = [
-            f"{adjective} {readable_category}",
-            f"{readable_category} - {adjective} Design",
-            f"{adjective} {readable_category} Collection",
-            f"{readable_category} - {adjective} Style",
-            f"{adjective} {readable_category} Ensemble",
-            f"{readable_category} - {adjective} Piece",
-            f"{adjective} {readable_category} Attire",
-            f"{readable_category} - {adjective} Look",
-            f"{adjective} {readable_category} Outfit",
-            f"{readable_category} - {adjective} Fashion",
-            f"{adjective} {readable_category} Wear",
-            f"{readable_category} - {adjective} Choice",
-            f"{adjective} {readable_category} Selection",
-            f"{readable_category} - {adjective} Creation",
-            f"{adjective} {readable_category} Masterpiece"
-        ]
-        
-        # Choose the best title that fits within 150 characters
-        for title in title_variations:
-            if len(title) <= 150:
-                return title
-        
-        # Fallback to simple category name if all variations are too long
-        return readable_category[:150]
-    
-    def generate_natural_description(self, broad_category, confidence):
+    def generate_natural_title(self, broad_category, confidence, seed=0):
+        """
+        Generate a natural, fashion-expert-like title (max 150 characters) with varied phrases.
+        
+        Titles are cached per (category, confidence tier, seed); pass a different seed to
+        get a different phrasing for the same category and tier.
+        """
+        return _title(broad_category, _confidence_tier(confidence), seed)
+    
+    def generate_natural_description(self, broad_category, confidence, seed=0):
         """Generate a natural, designer-like description (max 200 characters)."""
-        readable_category = broad_category.replace('_', ' ').title()
-        
-        # Fashion designer language based on confidence
-        if confidence >= 0.9:
-            style_phrases = [
-                "exquisitely crafted", "masterfully designed", "breathtakingly beautiful",
-                "artistically rendered", "professionally tailored", "luxuriously styled"
-            ]
-            appeal_phrases = [
-                "A true masterpiece that celebrates rich heritage.",
-                "This piece showcases the finest in ethnic fashion.",
-                "A stunning example of contemporary elegance."
-            ]
-        elif confidence >= 0.7:
-            style_phrases = [
-                "beautifully designed", "elegantly crafted", "sophisticatedly styled",
-                "professionally made", "artistically created", "carefully tailored"
-            ]
-            appeal_phrases = [
-                "Perfectly balances traditional charm with modern sophistication.",
-                "A stunning example of contemporary Indian fashion.",
-                "Offers the perfect blend of cultural heritage and style."
-            ]
-        elif confidence >= 0.5:
-            style_phrases = [
-                "well-crafted", "carefully designed", "thoughtfully styled",
-                "skillfully made", "attractively created", "nicely tailored"
-            ]
-            appeal_phrases = [
-                "Captures the essence of traditional Indian fashion beautifully.",
-                "Showcases the timeless appeal of ethnic wear.",
-                "Offers a wonderful introduction to authentic fashion."
-            ]
-        else:
-            style_phrases = [
-                "uniquely styled", "distinctively crafted", "specially designed",
-                "unusually made", "notably created", "remarkably tailored"
-            ]
-            appeal_phrases = [
-                "Offers a distinctive take on traditional fashion.",
-                "Stands out in the world of ethnic wear.",
-                "Brings a fresh perspective to classic fashion."
-            ]
-        
-        import random
-        style_phrase = random.choice(style_phrases)
-        appeal_phrase = random.choice(appeal_phrases)
-        
-        # Create shorter, natural description (max 200 characters)
-        description = f"A {style_phrase} {readable_category.lower()}. {appeal_phrase}"
-        
-        # Ensure it fits within 200 characters
-        if len(description) > 200:
-            # Try shorter variations
-            short_descriptions = [
-                f"Beautiful {readable_category.lower()} with elegant design.",
-                f"Stylish {readable_category.lower()} for modern women.",
-                f"Elegant {readable_category.lower()} with traditional charm.",
-                f"Sophisticated {readable_category.lower()} for special occasions.",
-                f"Chic {readable_category.lower()} with contemporary appeal."
-            ]
-            for short_desc in short_descriptions:
-                if len(short_desc) <= 200:
-                    return short_desc
+        return _description(broad_category, _confidence_tier(confidence), seed)
+    
+    def _download_batch(self, rows):
+        """
+        Download the images of a batch concurrently into memory.
+        
+        Args:
+            rows (list): (record_id, image_url) tuples
             
-            # Final fallback
-            return f"Beautiful {readable_category.lower()}."[:200]
+        Returns:
+            dict: {record_id: image_bytes} for every successful download
+        """
+        if not rows:
+            return {}
         
-        return description
+        with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, len(rows))) as executor:
+            downloads = executor.map(lambda row: self.download_image_from_url(row[1]), rows)
+            return {record_id: image_bytes
+                    for (record_id, _), image_bytes in zip(rows, downloads) if image_bytes is not None}
+    
+    def _prefetch_batch(self, rows):
+        """
+        Download and decode the images of a batch; runs on the prefetch thread of _process_images.
+        
+        Returns:
+            dict: {record_id: (image, error)} for every successful download, where image is
+                the preprocessed tensor or None if it could not be decoded
+        """
+        downloads = self._download_batch(rows)
+        preprocessed = self.classifier.preprocess_bytes_batch(list(downloads.values()))
+        return dict(zip(downloads, preprocessed))
     
     def classify_database_image(self, image_url, record_id):
         """Classify a single image from database URL."""
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-            local_path = tmp_file.name
+        # Download image from URL
+        image_bytes = self.download_image_from_url(image_url)
+        if image_bytes is None:
+            return None
         
+        return self.classify_image_data(image_bytes, image_url, record_id)
+    
+    def classify_image_data(self, image_bytes, image_url, record_id):
+        """Classify a downloaded image and generate its title and description."""
+        result = self._classify_image_bytes(image_bytes, image_url, record_id)
+        return self._describe_results([result])[0] if result else None
+    
+    def _classify_image_bytes(self, image_bytes, image_url, record_id):
+        """Run the CLIP classifier on a downloaded image, returning None on failure."""
         try:
-            # Download image from URL
-            if not self.download_image_from_url(image_url, local_path):
-                return None
-            
-            # Classify image
-            result = self.classifier.classify_image(local_path)
+            result = self.classifier.classify_image_bytes(image_bytes, image_path=image_url)
             result['record_id'] = record_id
             result['image_url'] = image_url
-            
-            # Generate broad category, title, and description
-            specific_category = result.get('final_classification', 'Unknown')
-            broad_category = self.map_to_broad_category(specific_category)
-            confidence = result.get('confidence', 0.0)
-            
-            title = self.generate_natural_title(broad_category, confidence)
-            description = self.generate_natural_description(broad_category, confidence)
-            
-            result.update({
-                'broad_category': broad_category,
-                'title': title,
-                'description': description,
-                'processed_at': datetime.now().isoformat()
-            })
-            
             return result
             
         except Exception as e:
             logger.error(f"❌ Failed to classify image for record {record_id}: {e}")
             return None
-        finally:
-            # Clean up temporary file
-            if os.path.exists(local_path):
-                os.unlink(local_path)
+    
+    def _classify_image_batch(self, items, batch_size):
+        """
+        Run the CLIP classifier on prefetched images in batches of batch_size.
+        
+        Args:
+            items (list): (record_id, image_url, (image, error)) tuples from _prefetch_batch
+            batch_size (int): Number of images per model forward pass
+            
+        Returns:
+            list: Classification results for the images that could be classified
+        """
+        if not items:
+            return []
+        
+        for record_id, image_url, _ in items:
+            logger.info(f"📸 Processing record {record_id}: {image_url}")
+        
+        try:
+            results = self.classifier.classify_preprocessed_batch(
+                [preprocessed for _, _, preprocessed in items],
+                image_paths=[image_url for _, image_url, _ in items],
+                batch_size=batch_size
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to classify batch of {len(items)} images: {e}")
+            return []
+        
+        for result, (record_id, image_url, _) in zip(results, items):
+            result['record_id'] = record_id
+            result['image_url'] = image_url
+        return results
+    
+    def _describe_results(self, results):
+        """
+        Add broad category, title, and description to a batch of classification results.
+        
+        Confidence tiers for the whole batch come from a single np.searchsorted call, and the
+        texts themselves are cached per (category, tier, seed).
+        """
+        if not results:
+            return results
+        
+        confidences = np.fromiter((r.get('confidence', 0.0) for r in results), dtype=np.float64,
+                                  count=len(results))
+        tiers = np.searchsorted(_TIER_FLOORS, confidences, side='right').tolist()
+        processed_at = datetime.now().isoformat()
+        
+        for result, tier in zip(results, tiers):
+            broad_category = self.map_to_broad_category(result.get('final_classification', 'Unknown'))
+            seed = _variant_seed(result['record_id'])
+            result.update({
+                'broad_category': broad_category,
+                'title': _title(broad_category, tier, seed),
+                'description': _description(broad_category, tier, seed),
+                'processed_at': processed_at
+            })
+        
+        return results
     
     def update_database_record(self, table_name, id_column, record_id, title, description):
         """Update a single record in the database."""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with self._conn() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(f"""
-                        UPDATE {table_name}
-                        SET garment_title = %s, garment_description = %s
-                        WHERE {id_column} = %s;
-                    """, (title, description, record_id))
+                    cursor.execute(_update_sql(table_name, id_column), (title, description, record_id))
                     conn.commit()
                     return True
         except Exception as e:
             logger.error(f"❌ Failed to update record {record_id}: {e}")
             return False
     
+    def _id_column_type(self, cursor, table_name, id_column):
+        """Look up the SQL type of the key column once per table."""
+        key = (table_name, id_column)
+        if key not in self._id_types:
+            cursor.execute("""
+                SELECT format_type(atttypid, atttypmod)
+                FROM pg_attribute
+                WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped;
+            """, (_identifier(table_name).as_string(cursor), id_column))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Column {id_column} not found in {table_name}")
+            self._id_types[key] = row[0]
+        return self._id_types[key]
+    
+    def update_database_records(self, table_name, id_column, rows, page_size=100):
+        """
+        Update many records in a single round-trip.
+        
+        Args:
+            table_name (str): Name of the table
+            id_column (str): Primary key column
+            rows (list): (record_id, title, description) tuples
+            page_size (int): Maximum number of rows per UPDATE statement
+            
+        Returns:
+            int: Number of records updated
+        """
+        if not rows:
+            return 0
+        
+        try:
+            with self._conn() as conn:
+                with conn.cursor() as cursor:
+                    id_type = self._id_column_type(cursor, table_name, id_column)
+                    updated = execute_values(cursor, _update_values_sql(table_name, id_column, id_type), rows,
+                                             template="(%s, %s, %s)", page_size=page_size, fetch=True)
+                    conn.commit()
+                    return len(updated)
+        except Exception as e:
+            logger.error(f"❌ Batch update of {len(rows)} records failed, updating one by one: {e}")
+            return self._update_records_one_by_one(table_name, id_column, rows)
+    
+    def _update_records_one_by_one(self, table_name, id_column, rows):
+        """
+        Fallback for update_database_records: update each row in its own transaction.
+        
+        The UPDATE is prepared once on the borrowed connection and executed per row, so
+        PostgreSQL parses and plans it only once. One bad row does not undo the others.
+        """
+        updated = 0
+        # Not borrowed through _conn: its `with conn` block would wrap every statement in
+        # one transaction even in autocommit mode, so the first bad row would undo the rest
+        conn = self._pool.getconn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                # Parameter types are inferred from the target columns
+                cursor.execute(_prepare_update_sql(table_name, id_column))
+                try:
+                    for record_id, title, description in rows:
+                        try:
+                            cursor.execute("EXECUTE upd_garment (%s, %s, %s);",
+                                           (title, description, record_id))
+                            updated += cursor.rowcount > 0
+                        except Exception as e:
+                            logger.error(f"❌ Failed to update record {record_id}: {e}")
+                finally:
+                    cursor.execute("DEALLOCATE upd_garment;")
+        except Exception as e:
+            logger.error(f"❌ One-by-one update failed after {updated} records: {e}")
+        finally:
+            try:
+                conn.autocommit = False
+            except Exception:
+                # A broken connection is discarded instead of going back to the pool
+                self._pool.putconn(conn, close=True)
+            else:
+                self._pool.putconn(conn)
+        return updated
+    
+    def copy_update_database_records(self, table_name, id_column, rows):
+        """
+        Update many records by streaming them into a staging table with COPY.
+        
+        The rows are copied into a temporary table in one streamed write and merged with a
+        single UPDATE ... FROM, which is much faster than paged UPDATEs for large backfills.
+        
+        Args:
+            table_name (str): Name of the table
+            id_column (str): Primary key column
+            rows (list): (record_id, title, description) tuples
+            
+        Returns:
+            int: Number of records updated
+        """
+        if not rows:
+            return 0
+        
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
+        
+        create_staging, merge = _copy_merge_sql(table_name, id_column)
+        
+        try:
+            with self._conn() as conn:
+                with conn.cursor() as cursor:
+                    # Temporary tables are never WAL-logged; the column types follow the target table
+                    cursor.execute(create_staging)
+                    cursor.copy_expert(
+                        "COPY tmp_garment_upd (id, title, description) FROM STDIN WITH (FORMAT CSV)", buf
+                    )
+                    cursor.execute(merge)
+                    updated = cursor.rowcount
+                    conn.commit()
+                    return updated
+        except Exception as e:
+            logger.error(f"❌ COPY update of {len(rows)} records failed, falling back to batched updates: {e}")
+            return self.update_database_records(table_name, id_column, rows)
+    
     def process_database_images(self, table_name, image_column, id_column, 
-                              where_clause="", max_images=None, batch_size=10):
+                              where_clause="", max_images=None, batch_size=10, ordered=False):
         """
         Process images from database and update garment_title and garment_description columns.
         
@@ -414,7 +700,40 @@ class PostgresGarmentClassifier:
             where_clause (str): Optional WHERE clause to filter records
             max_images (int): Maximum number of images to process (None for all)
             batch_size (int): Number of images to process in each batch
+            ordered (bool): Process rows in id_column order, so max_images picks the lowest IDs
+        """
+        return self._process_images(table_name, image_column, id_column, where_clause,
+                                    max_images, batch_size, ordered, bulk=False)
+    
+    def process_database_images_bulk(self, table_name, image_column, id_column,
+                                     where_clause="", max_images=None, batch_size=10, ordered=False):
         """
+        Like process_database_images, but write all updates at the end with one COPY.
+        
+        Use this for full-table backfills. No rows are updated until every image has been
+        classified, so an interrupted run leaves the table untouched.
+        
+        Args:
+            table_name (str): Name of the table
+            image_column (str): Column containing image URLs/paths
+            id_column (str): Primary key column
+            where_clause (str): Optional WHERE clause to filter records
+            max_images (int): Maximum number of images to process (None for all)
+            batch_size (int): Number of images to download and classify at a time
+            ordered (bool): Process rows in id_column order, so max_images picks the lowest IDs
+        """
+        return self._process_images(table_name, image_column, id_column, where_clause,
+                                    max_images, batch_size, ordered, bulk=True)
+    
+    def _update_batch(self, table_name, id_column, rows, batch_num, page_size):
+        """Write one batch's updates; runs on the writer thread of _process_images."""
+        updated = self.update_database_records(table_name, id_column, rows, page_size=page_size)
+        logger.info(f"✅ Updated {updated}/{len(rows)} records in batch {batch_num}")
+        return updated
+    
+    def _process_images(self, table_name, image_column, id_column, where_clause,
+                        max_images, batch_size, ordered, bulk):
+        """Shared classification loop; bulk defers all updates to one COPY at the end."""
         logger.info(f"🚀 Starting PostgreSQL garment classification process")
         logger.info(f"📊 Table: {table_name}")
         logger.info(f"🖼️ Image Column: {image_column}")
@@ -425,69 +744,98 @@ class PostgresGarmentClassifier:
         # Create backup table if requested
         backup_table_name = None
         if self.backup_table:
-            backup_table_name = self.create_backup_table(table_name)
+            backup_table_name = self.create_backup_table(table_name, id_column)
         
-        # Get images to process
-        images_df = self.get_images_to_process(table_name, image_column, id_column, where_clause)
-        
-        if images_df.empty:
-            logger.warning("⚠️ No images found to process")
-            return None
+        # Stream images to process, fetching a few batches' worth of rows per round trip
+        stream = self.get_images_to_process(table_name, image_column, id_column, where_clause,
+                                            batch_size=batch_size * 4, ordered=ordered)
         
         # Limit number of images if specified
-        if max_images:
-            images_df = images_df.head(max_images)
+        images = islice(stream, max_images) if max_images else stream
         
-        logger.info(f"🔄 Processing {len(images_df)} images in batches of {batch_size}...")
+        logger.info(f"🔄 Processing images in batches of {batch_size}...")
         
         # Process images in batches
-        results = []
+        all_updates = []
+        total_images = 0
         total_processed = 0
         total_updated = 0
         
-        for i in range(0, len(images_df), batch_size):
-            batch_df = images_df.iloc[i:i+batch_size]
-            logger.info(f"📦 Processing batch {i//batch_size + 1}/{(len(images_df)-1)//batch_size + 1}")
+        batches = iter(lambda: list(islice(images, batch_size)), [])
+        
+        # Results are streamed to an NDJSON file, one classification per line
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        final_file = f"postgres_classification_results_{timestamp}.jsonl"
+        
+        # Pipeline the stages: while a batch is classified on this thread, the next batch
+        # downloads and decodes on the prefetch thread and the previous batch's UPDATE runs
+        # on the writer. Only one batch is prefetched, so at most two are decoded at once.
+        # closing(stream) releases the cursor's connection even if max_images stopped the
+        # stream early or a stage raised
+        with closing(stream), open(final_file, 'wb') as results_out, \
+                ThreadPoolExecutor(max_workers=1) as prefetcher, \
+                ThreadPoolExecutor(max_workers=1) as writer:
+            pending_writes = []
+            rows = next(batches, None)
+            next_download = prefetcher.submit(self._prefetch_batch, rows) if rows else None
             
-            batch_results = []
-            for _, row in batch_df.iterrows():
-                record_id = row[id_column]
-                image_url = row[image_column]
+            for batch_num in count(1):
+                if not rows:
+                    break
+                total_images += len(rows)
+                logger.info(f"📦 Processing batch {batch_num} ({len(rows)} images)")
                 
-                logger.info(f"📸 Processing record {record_id}: {image_url}")
-                result = self.classify_database_image(image_url, record_id)
+                pending_updates = []
                 
-                if result:
-                    # Update database
-                    if self.update_database_record(table_name, id_column, record_id, 
-                                                 result['title'], result['description']):
-                        total_updated += 1
-                        logger.info(f"✅ Updated record {record_id}: {result['title']}")
-                    else:
-                        logger.error(f"❌ Failed to update record {record_id}")
-                    
-                    batch_results.append(result)
-                    total_processed += 1
-                else:
-                    logger.warning(f"⚠️ Failed to classify record {record_id}")
-            
-            results.extend(batch_results)
+                # Wait for this batch's downloads and decoding and start fetching the next batch
+                downloads = next_download.result()
+                next_rows = next(batches, None)
+                if next_rows:
+                    next_download = prefetcher.submit(self._prefetch_batch, next_rows)
+                
+                for record_id, image_url in rows:
+                    if record_id not in downloads:
+                        logger.warning(f"⚠️ Failed to download image for record {record_id}")
+                
+                # Classify the whole batch in one forward pass
+                batch_results = self._classify_image_batch(
+                    [(record_id, image_url, downloads[record_id])
+                     for record_id, image_url in rows if record_id in downloads],
+                    batch_size
+                )
+                
+                # Generate titles and descriptions for the whole batch at once
+                for result in self._describe_results(batch_results):
+                    pending_updates.append((result['record_id'], result['title'], result['description']))
+                    logger.info(f"📝 Classified record {result['record_id']}: {result['title']}")
+                total_processed += len(batch_results)
+                
+                # Update database once for the whole batch, or once at the end in bulk mode
+                if bulk:
+                    all_updates.extend(pending_updates)
+                elif pending_updates:
+                    pending_writes.append(writer.submit(
+                        self._update_batch, table_name, id_column, pending_updates, batch_num, batch_size
+                    ))
+                
+                # Append the batch to the results file instead of keeping it in memory
+                results_out.writelines(_json_line(result) for result in batch_results)
+                
+                rows = next_rows
             
-            # Save batch results as backup
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            batch_file = f"batch_results_{timestamp}_batch_{i//batch_size + 1}.json"
-            with open(batch_file, 'w') as f:
-                json.dump(batch_results, f, indent=2)
-            logger.info(f"💾 Batch results saved to: {batch_file}")
-        
-        # Save final results
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        final_file = f"postgres_classification_results_{timestamp}.json"
-        with open(final_file, 'w') as f:
-            json.dump(results, f, indent=2)
+            total_updated += sum(write.result() for write in pending_writes)
+        
+        if not total_images:
+            os.remove(final_file)
+            logger.warning("⚠️ No images found to process")
+            return None
+        
+        if bulk:
+            logger.info(f"📤 Copying {len(all_updates)} updates into the database...")
+            total_updated = self.copy_update_database_records(table_name, id_column, all_updates)
         
         logger.info(f"✅ Classification Complete!")
-        logger.info(f"📊 Total Images: {len(images_df)}")
+        logger.info(f"📊 Total Images: {total_images}")
         logger.info(f"🔄 Processed: {total_processed}")
         logger.info(f"✅ Updated: {total_updated}")
         logger.info(f"💾 Results saved to: {final_file}")
@@ -495,7 +843,7 @@ class PostgresGarmentClassifier:
             logger.info(f"💾 Backup table: {backup_table_name}")
         
         return {
-            'total_images': len(images_df),
+            'total_images': total_images,
             'processed_images': total_processed,
             'updated_images': total_updated,
             'backup_table': backup_table_name,
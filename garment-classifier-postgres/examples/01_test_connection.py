@@ -8,7 +8,9 @@ import sys
 import os
 
 # Add the parent directory to the path so we can import from core
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 from core.postgres_garment_classifier import PostgresGarmentClassifier
 from config import DB_CONFIG
@@ -8,7 +8,9 @@ import sys
 import os
 
 # Add the parent directory to the path so we can import from core
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 from core.postgres_garment_classifier import PostgresGarmentClassifier
 from config import DB_CONFIG, TABLE_NAME, IMAGE_COLUMN, ID_COLUMN
@@ -74,7 +76,7 @@ def main():
     
     if success:
         print("\n📝 Next steps:")
-        print("1. Review the results in the generated JSON file")
+        print("1. Review the results in the generated .jsonl file (one JSON object per line)")
         print("2. Check your database to see the updated records")
         print("3. Run: python examples/03_full_classification.py")
         print("4. Or run: python examples/04_custom_usage.py for advanced options")
@@ -6,9 +6,12 @@ Runs the complete garment classification on all images in your database
 
 import sys
 import os
+import argparse
 
 # Add the parent directory to the path so we can import from core
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 from core.postgres_garment_classifier import PostgresGarmentClassifier
 from config import DB_CONFIG, TABLE_NAME, IMAGE_COLUMN, ID_COLUMN, WHERE_CLAUSE, BATCH_SIZE, MAX_IMAGES
@@ -84,20 +87,31 @@ def full_classification():
 
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Classify all images in your database")
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="Skip the confirmation prompt (for cron jobs and pipelines)")
+    args = parser.parse_args()
+    
     print("⚠️  Warning: This will process ALL images in your database!")
     print("   Make sure you have a backup of your data.")
     print("   The system will create an automatic backup table before processing.")
     
-    response = input("\nDo you want to continue? (y/N): ").strip().lower()
-    if response not in ['y', 'yes']:
-        print("❌ Classification cancelled")
-        return False
+    if not args.yes:
+        if not sys.stdin.isatty():
+            # Nobody can answer the prompt, so stop instead of blocking forever
+            print("❌ No terminal to confirm on; re-run with --yes to process without prompting")
+            return False
+        
+        response = input("\nDo you want to continue? (y/N): ").strip().lower()
+        if response not in ['y', 'yes']:
+            print("❌ Classification cancelled")
+            return False
     
     success = full_classification()
     
     if success:
         print("\n📝 Next steps:")
-        print("1. Review the results in the generated JSON file")
+        print("1. Review the results in the generated .jsonl file (one JSON object per line)")
         print("2. Check your database to see all updated records")
         print("3. Review the backup table for safety")
         print("4. Run: python examples/04_custom_usage.py for advanced options")
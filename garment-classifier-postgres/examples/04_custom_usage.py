@@ -8,7 +8,9 @@ import sys
 import os
 
 # Add the parent directory to the path so we can import from core
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
 from core.postgres_garment_classifier import PostgresGarmentClassifier
 from config import DB_CONFIG, TABLE_NAME, IMAGE_COLUMN, ID_COLUMN
@@ -18,140 +20,72 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def example_filtered_processing():
-    """Example: Process only records with empty titles."""
-    print("\n🚀 Example A: Filtered Processing - Only Empty Titles")
-    print("-" * 50)
-    
-    try:
-        classifier = PostgresGarmentClassifier(
-            db_config=DB_CONFIG,
-            confidence_threshold=0.15,
-            backup_table=True
-        )
-        
-        results = classifier.process_database_images(
-            table_name=TABLE_NAME,
-            image_column=IMAGE_COLUMN,
-            id_column=ID_COLUMN,
-            where_clause="garment_title IS NULL OR garment_title = ''",
-            max_images=10,  # Limit to 10 images for demo
-            batch_size=5
-        )
-        
-        if results:
-            print(f"✅ Filtered processing completed!")
-            print(f"📊 Processed: {results['processed_images']} images")
-            print(f"✅ Updated: {results['updated_images']} records")
-        else:
-            print("❌ Filtered processing failed")
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
+# (heading, label, confidence_threshold, process_database_images options)
+EXAMPLES = [
+    ("A: Filtered Processing - Only Empty Titles", "Filtered", 0.15,
+     dict(where_clause="garment_title IS NULL OR garment_title = ''", max_images=10, batch_size=5)),
+    ("B: Limited Processing - First 20 Images", "Limited", 0.15,
+     dict(max_images=20, batch_size=5, ordered=True)),
+    ("C: Lower Confidence - More Results", "Lower confidence", 0.1,
+     dict(max_images=10, batch_size=5)),
+    ("D: Small Batches - Memory Optimization", "Small batch", 0.15,
+     dict(max_images=15, batch_size=2)),
+]
 
-def example_limited_processing():
-    """Example: Process only first N images."""
-    print("\n🚀 Example B: Limited Processing - First 20 Images")
+def run_example(classifier, heading, label, *, confidence_threshold=0.15, **kwargs):
+    """Run one example on the shared classifier with the given threshold and options."""
+    print(f"\n🚀 Example {heading}")
     print("-" * 50)
     
+    previous_threshold = classifier.confidence_threshold
     try:
-        classifier = PostgresGarmentClassifier(
-            db_config=DB_CONFIG,
-            confidence_threshold=0.15,
-            backup_table=True
-        )
-        
-        results = classifier.process_database_images(
-            table_name=TABLE_NAME,
-            image_column=IMAGE_COLUMN,
-            id_column=ID_COLUMN,
-            max_images=20,  # Only first 20 images
-            batch_size=5
-        )
+        classifier.update_confidence_threshold(confidence_threshold)
+        try:
+            results = classifier.process_database_images(
+                table_name=TABLE_NAME,
+                image_column=IMAGE_COLUMN,
+                id_column=ID_COLUMN,
+                **kwargs
+            )
+        finally:
+            classifier.update_confidence_threshold(previous_threshold)
         
         if results:
-            print(f"✅ Limited processing completed!")
+            print(f"✅ {label} processing completed!")
             print(f"📊 Processed: {results['processed_images']} images")
             print(f"✅ Updated: {results['updated_images']} records")
         else:
-            print("❌ Limited processing failed")
+            print(f"❌ {label} processing failed")
             
     except Exception as e:
         print(f"❌ Error: {e}")
 
-def example_lower_confidence():
-    """Example: Lower confidence threshold for more results."""
-    print("\n🚀 Example C: Lower Confidence - More Results")
-    print("-" * 50)
-    
-    try:
-        classifier = PostgresGarmentClassifier(
-            db_config=DB_CONFIG,
-            confidence_threshold=0.1,  # Lower threshold
-            backup_table=True
-        )
-        
-        results = classifier.process_database_images(
-            table_name=TABLE_NAME,
-            image_column=IMAGE_COLUMN,
-            id_column=ID_COLUMN,
-            max_images=10,  # Limit for demo
-            batch_size=5
-        )
-        
-        if results:
-            print(f"✅ Lower confidence processing completed!")
-            print(f"📊 Processed: {results['processed_images']} images")
-            print(f"✅ Updated: {results['updated_images']} records")
-        else:
-            print("❌ Lower confidence processing failed")
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-
-def example_small_batches():
-    """Example: Small batch size for memory optimization."""
-    print("\n🚀 Example D: Small Batches - Memory Optimization")
-    print("-" * 50)
+def main():
+    """Main function."""
+    print("🚀 Example 4: Custom Usage - Advanced Options")
+    print("=" * 60)
+    print("This example demonstrates different configuration options.")
+    print("Each example processes a limited number of images for demonstration.")
+    print()
     
+    # Load the CLIP model and open the database pool once for all examples
     try:
         classifier = PostgresGarmentClassifier(
             db_config=DB_CONFIG,
             confidence_threshold=0.15,
             backup_table=True
         )
-        
-        results = classifier.process_database_images(
-            table_name=TABLE_NAME,
-            image_column=IMAGE_COLUMN,
-            id_column=ID_COLUMN,
-            max_images=15,  # Limit for demo
-            batch_size=2    # Small batch size
-        )
-        
-        if results:
-            print(f"✅ Small batch processing completed!")
-            print(f"📊 Processed: {results['processed_images']} images")
-            print(f"✅ Updated: {results['updated_images']} records")
-        else:
-            print("❌ Small batch processing failed")
-            
     except Exception as e:
         print(f"❌ Error: {e}")
-
-def main():
-    """Main function."""
-    print("🚀 Example 4: Custom Usage - Advanced Options")
-    print("=" * 60)
-    print("This example demonstrates different configuration options.")
-    print("Each example processes a limited number of images for demonstration.")
-    print()
+        return
     
-    # Run different examples
-    example_filtered_processing()
-    example_limited_processing()
-    example_lower_confidence()
-    example_small_batches()
+    # Run different examples; the first one creates the backup table. They are kept as
+    # separate runs so each option's effect shows on its own, and the shared classifier
+    # means each extra run costs only one query and one update per batch
+    for heading, label, threshold, options in EXAMPLES:
+        run_example(classifier, heading, label, confidence_threshold=threshold, **options)
+        classifier.backup_table = False
+    classifier.close()
     
     print("\n" + "=" * 60)
     print("🎉 All examples completed!")